@@ -1,51 +1,462 @@
 import streamlit as st
 import numpy as np
-from skimage import io, filters, img_as_ubyte
+from skimage import io, img_as_ubyte
 from skimage.morphology import disk
 from PIL import Image
 import io as python_io
+import threading
+from numba import njit, prange
 
-def process_image(image, radius=5, tolerance=0.1):
-    """Process the uploaded image and return original and highlighted versions"""
+try:
+    import cupy as cp
+    GPU_AVAILABLE = cp.cuda.is_available()
+except ImportError:
+    cp = None
+    GPU_AVAILABLE = False
+
+# Colour used to mark matching pixels
+RED = np.array([255, 0, 0], np.uint8)
+
+# Above this fraction of matching pixels the highlight is written through the
+# boolean mask, so the int64 index array never grows past 4 bytes per pixel
+_SPARSE_HIGHLIGHT_FRACTION = 0.5
+
+@njit(cache=True)
+def _disk_half_widths(radius):
+    """Half-width of a disk footprint for each row offset -radius..radius"""
+    half_widths = np.empty(2 * radius + 1, np.int64)
+    for dy in range(-radius, radius + 1):
+        w = 0
+        while (w + 1) * (w + 1) + dy * dy <= radius * radius:
+            w += 1
+        half_widths[dy + radius] = w
+    return half_widths
+
+@njit(cache=True)
+def _entropy_tables(radius):
+    """log2(c) and c * log2(c) for every possible window count c, so entropy = log2(n) - sum(c * log2(c)) / n"""
+    n_max = (2 * radius + 1) * (2 * radius + 1)
+    log2_table = np.zeros(n_max + 1, np.float64)
+    clog2c_table = np.zeros(n_max + 1, np.float64)
+    for c in range(1, n_max + 1):
+        log2_table[c] = np.log2(c)
+        clog2c_table[c] = c * log2_table[c]
+    return log2_table, clog2c_table
+
+@njit(inline="always")
+def _count(hist, value, step, clog2c_table):
+    """Change hist[value] by step (+1 or -1) and return the resulting change in S"""
+    c = hist[value]
+    hist[value] = c + step
+    return clog2c_table[c + step] - clog2c_table[c]
+
+@njit(inline="always")
+def _entropy_from_sum(clog2c_sum, n, log2_table):
+    """Entropy in bits of a window of n pixels whose counts have sum(c * log2(c)) = clog2c_sum"""
+    return max(log2_table[n] - clog2c_sum / n, 0.0)
+
+@njit(fastmath=True, cache=True)
+def _hist_entropy(hist, n, log2_table, clog2c_table):
+    """Entropy in bits of a window histogram holding n pixels"""
+    clog2c_sum = 0.0
+    for b in range(hist.shape[0]):
+        clog2c_sum += clog2c_table[hist[b]]
+    return _entropy_from_sum(clog2c_sum, n, log2_table)
+
+@njit(parallel=True, fastmath=True, cache=True)
+def entropy_sliding(img, half_widths, n_bins=256):
+    """Local entropy (bits) of each plane of a (C, H, W) image over a footprint with the given row half-widths.
+
+    Returns a (C, H, W) float32 array; pixel values must lie in [0, n_bins).
+    """
+    radius = half_widths.size // 2
+    n_channels, height, width = img.shape
+    log2_table, clog2c_table = _entropy_tables(radius)
+    
+    entropy = np.empty((n_channels, height, width), np.float32)
+    for task in prange(n_channels * height):
+        k = task // height
+        y = task % height
+        hist = np.zeros(n_bins, np.int64)
+        clog2c_sum = 0.0
+        n = 0
+        
+        # Initial window centred on x = 0
+        for dy in range(-radius, radius + 1):
+            yy = y + dy
+            if yy < 0 or yy >= height:
+                continue
+            for xx in range(min(half_widths[dy + radius], width - 1) + 1):
+                clog2c_sum += _count(hist, img[k, yy, xx], 1, clog2c_table)
+                n += 1
+        
+        for x in range(width):
+            if x > 0:
+                for dy in range(-radius, radius + 1):
+                    yy = y + dy
+                    if yy < 0 or yy >= height:
+                        continue
+                    w = half_widths[dy + radius]
+                    x_out = x - w - 1
+                    if x_out >= 0:
+                        clog2c_sum += _count(hist, img[k, yy, x_out], -1, clog2c_table)
+                        n -= 1
+                    x_in = x + w
+                    if x_in < width:
+                        clog2c_sum += _count(hist, img[k, yy, x_in], 1, clog2c_table)
+                        n += 1
+            
+            entropy[k, y, x] = _entropy_from_sum(clog2c_sum, n, log2_table)
+    
+    return entropy
+
+def entropy_disk(img, radius, n_bins=256):
+    """Local entropy (bits) of each plane of a (C, H, W) image over a disk footprint"""
+    return entropy_sliding(img, _disk_half_widths(radius), n_bins)
+
+# Rows per work item in entropy_box; each band keeps its own column histograms
+_BAND_HEIGHT = 64
+
+@njit(parallel=True, fastmath=True, cache=True)
+def entropy_box(img, radius, n_bins=256):
+    """Local entropy (bits) of each plane of a (C, H, W) image over a square footprint, in O(n_bins) per pixel.
+
+    Returns a (C, H, W) float32 array; pixel values must lie in [0, n_bins).
+    """
+    n_channels, height, width = img.shape
+    log2_table, clog2c_table = _entropy_tables(radius)
+    n_bands = (height + _BAND_HEIGHT - 1) // _BAND_HEIGHT
+    
+    entropy = np.empty((n_channels, height, width), np.float32)
+    for task in prange(n_channels * n_bands):
+        k = task // n_bands
+        y_start = (task % n_bands) * _BAND_HEIGHT
+        y_stop = min(y_start + _BAND_HEIGHT, height)
+        
+        # Column histograms over rows y_start - radius .. y_start + radius
+        columns = np.zeros((width, n_bins), np.int32)
+        for yy in range(max(0, y_start - radius), min(height, y_start + radius + 1)):
+            for x in range(width):
+                columns[x, img[k, yy, x]] += 1
+        
+        hist = np.empty(n_bins, np.int32)
+        for y in range(y_start, y_stop):
+            if y > y_start:
+                # Move every column histogram down one row
+                y_out = y - radius - 1
+                if y_out >= 0:
+                    for x in range(width):
+                        columns[x, img[k, y_out, x]] -= 1
+                y_in = y + radius
+                if y_in < height:
+                    for x in range(width):
+                        columns[x, img[k, y_in, x]] += 1
+            n_rows = min(height, y + radius + 1) - max(0, y - radius)
+            
+            # Initial window centred on x = 0
+            hist[:] = 0
+            for xx in range(min(radius, width - 1) + 1):
+                for b in range(n_bins):
+                    hist[b] += columns[xx, b]
+            
+            for x in range(width):
+                if x > 0:
+                    x_out = x - radius - 1
+                    if x_out >= 0:
+                        for b in range(n_bins):
+                            hist[b] -= columns[x_out, b]
+                    x_in = x + radius
+                    if x_in < width:
+                        for b in range(n_bins):
+                            hist[b] += columns[x_in, b]
+                n = n_rows * (min(width, x + radius + 1) - max(0, x - radius))
+                entropy[k, y, x] = _hist_entropy(hist, n, log2_table, clog2c_table)
+    
+    return entropy
+
+@njit(parallel=True, fastmath=True, cache=True)
+def fill_entropy_at(img, radius, n_bins, offsets_y, offsets_x, pending, entropy):
+    """Write the local entropy of a 2-D image into entropy where pending is set, counting each window directly"""
+    height, width = img.shape
+    log2_table, clog2c_table = _entropy_tables(radius)
+    
+    for y in prange(height):
+        hist = np.zeros(n_bins, np.int64)
+        for x in range(width):
+            if not pending[y, x]:
+                continue
+            clog2c_sum = 0.0
+            n = 0
+            for j in range(offsets_y.size):
+                yy = y + offsets_y[j]
+                xx = x + offsets_x[j]
+                if 0 <= yy < height and 0 <= xx < width:
+                    clog2c_sum += _count(hist, img[yy, xx], 1, clog2c_table)
+                    n += 1
+            entropy[y, x] = _entropy_from_sum(clog2c_sum, n, log2_table)
+            
+            # Empty the histogram again for the next pixel
+            for j in range(offsets_y.size):
+                yy = y + offsets_y[j]
+                xx = x + offsets_x[j]
+                if 0 <= yy < height and 0 <= xx < width:
+                    hist[img[yy, xx]] = 0
+
+@njit(parallel=True, cache=True)
+def compute_mask(entropy_red, entropy_green, entropy_blue, tolerance):
+    """Pixels where all three channel entropies are within tolerance of each other; NaN never matches, so no fastmath"""
+    height, width = entropy_red.shape
+    mask = np.empty((height, width), np.bool_)
+    for y in prange(height):
+        for x in range(width):
+            e_red = entropy_red[y, x]
+            e_green = entropy_green[y, x]
+            e_blue = entropy_blue[y, x]
+            mask[y, x] = (abs(e_red - e_green) < tolerance) & (abs(e_red - e_blue) < tolerance) & (abs(e_green - e_blue) < tolerance)
+    return mask
+
+@njit(parallel=True, fastmath=True, cache=True)
+def normalize_to_uint8(values):
+    """Linearly rescale a 2-D array to 0-255 uint8 for display (all zeros if constant)"""
+    height, width = values.shape
+    lo = np.inf
+    hi = -np.inf
+    for y in prange(height):
+        for x in range(width):
+            lo = min(lo, values[y, x])
+            hi = max(hi, values[y, x])
     
-    # Convert PIL image to numpy array
-    image_array = np.array(image)
+    scale = 255.0 / (hi - lo) if hi > lo else 0.0
+    out = np.empty((height, width), np.uint8)
+    for y in prange(height):
+        for x in range(width):
+            out[y, x] = np.uint8((values[y, x] - lo) * scale)
+    return out
+
+# Per-pixel port of entropy_sliding and entropy_box for CUDA devices: each thread
+# counts its channel histograms (at most three) over the flattened footprint
+# offsets, keeping sum(c * log2(c)) up to date from the lookup table as it goes
+_ENTROPY_GPU_KERNEL = cp.ElementwiseKernel(
+    "raw uint8 img, raw int32 offsets_y, raw int32 offsets_x, int32 n_offsets, "
+    "int32 height, int32 width, int32 n_channels, int32 n_bins, raw float32 clog2c_table",
+    "raw float32 entropy",
+    """
+    int y = i / width;
+    int x = i % width;
+    int hist[3 * 256];
+    for (int b = 0; b < n_channels * n_bins; b++) hist[b] = 0;
+    float clog2c_sum[3] = {0.0f, 0.0f, 0.0f};
+    int count = 0;
+    for (int j = 0; j < n_offsets; j++) {
+        int yy = y + offsets_y[j];
+        int xx = x + offsets_x[j];
+        if (yy < 0 || yy >= height || xx < 0 || xx >= width) continue;
+        for (int k = 0; k < n_channels; k++) {
+            int b = k * n_bins + img[(k * height + yy) * width + xx];
+            int c = hist[b];
+            clog2c_sum[k] += clog2c_table[c + 1] - clog2c_table[c];
+            hist[b] = c + 1;
+        }
+        count++;
+    }
+    float log2_count = log2f((float)count);
+    for (int k = 0; k < n_channels; k++) {
+        entropy[k * height * width + i] = fmaxf(log2_count - clog2c_sum[k] / count, 0.0f);
+    }
+    """,
+    "entropy_gpu",
+) if GPU_AVAILABLE else None
+
+@st.cache_resource
+def _footprint_offsets(radius, footprint):
+    """Row and column offsets of every pixel in a disk or square footprint, relative to its centre"""
+    if footprint == "square":
+        selem = np.ones((2 * radius + 1, 2 * radius + 1), np.uint8)
+    else:
+        selem = disk(radius)
+    offsets_y, offsets_x = np.nonzero(selem)
+    return offsets_y - radius, offsets_x - radius
+
+def entropy_gpu(img, radius, n_bins=256, footprint="disk"):
+    """GPU counterpart of entropy_sliding and entropy_box for up to three planes; takes and returns NumPy arrays"""
+    n_channels, height, width = img.shape
+    offsets_y, offsets_x = _footprint_offsets(radius, footprint)
+    _, clog2c_table = _entropy_tables(radius)
     
-    # Ensure the image is in RGB format
-    if len(image_array.shape) == 3 and image_array.shape[2] == 4:
-        image_array = image_array[:, :, :3]
-    elif len(image_array.shape) == 2:
-        # Convert grayscale to RGB
-        image_array = np.stack([image_array] * 3, axis=-1)
+    entropy = cp.empty((n_channels, height, width), cp.float32)
+    _ENTROPY_GPU_KERNEL(
+        cp.asarray(np.ascontiguousarray(img)),
+        cp.asarray(offsets_y, cp.int32),
+        cp.asarray(offsets_x, cp.int32),
+        np.int32(offsets_y.size), np.int32(height), np.int32(width),
+        np.int32(n_channels), np.int32(n_bins),
+        cp.asarray(clog2c_table, cp.float32),
+        entropy,
+        size=height * width,
+    )
+    return cp.asnumpy(entropy)
+
+@njit(parallel=True, cache=True)
+def rescale_into_bins(image_array, n_bins):
+    """Quantize an (H, W, C) uint8 image into n_bins equal-width bins, returned as contiguous (C, H, W) planes"""
+    height, width, n_channels = image_array.shape
+    planes = np.empty((n_channels, height, width), np.uint8)
+    for y in prange(height):
+        for k in range(n_channels):
+            for x in range(width):
+                planes[k, y, x] = image_array[y, x, k] * n_bins // 256
+    return planes
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _load_image(image_bytes):
+    """Decode the image once; returns a read-only uint8 array, (H, W) for grayscale and (H, W, 3) otherwise, and the mode"""
+    image = Image.open(python_io.BytesIO(image_bytes))
+    mode = image.mode
+    if mode not in ("L", "I", "I;16", "F", "RGB"):
+        # Everything that is not grayscale (possibly with more than 8 bits per
+        # pixel) or already RGB is converted; RGB goes straight to the array
+        image = image.convert("RGB")
+    image_array = np.asarray(image)
+    
+    # Convert to uint8 if necessary
+    image_array = img_as_ubyte(image_array)
+    
+    # Grayscale stored as RGB
+    if image_array.ndim == 3 and np.array_equal(image_array[:, :, 0], image_array[:, :, 1]) \
+            and np.array_equal(image_array[:, :, 1], image_array[:, :, 2]):
+        image_array = np.ascontiguousarray(image_array[:, :, 0])
+    image_array.setflags(write=False)
+    return image_array, mode
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _working_bins(image_bytes, n_bins, max_side):
+    """Read-only quantized (C, H, W) planes of the image, downscaled so the longest side is at most max_side"""
+    image_array, _ = _load_image(image_bytes)
     
-    # Split the image into RGB channels
-    red_channel = image_array[:, :, 0]
-    green_channel = image_array[:, :, 1]
-    blue_channel = image_array[:, :, 2]
+    # Work at a reduced resolution for large images
+    working_array = image_array
+    if max(image_array.shape[:2]) > max_side:
+        working_image = Image.fromarray(image_array)
+        working_image.thumbnail((max_side, max_side), Image.BILINEAR)
+        working_array = np.asarray(working_image)
     
-    # Convert channels to uint8 if necessary
-    red_channel = img_as_ubyte(red_channel)
-    green_channel = img_as_ubyte(green_channel)
-    blue_channel = img_as_ubyte(blue_channel)
+    if working_array.ndim == 2:
+        working_array = working_array[:, :, None]
+    binned = rescale_into_bins(working_array, n_bins)
+    binned.setflags(write=False)
+    return binned
+
+# entropy_box costs O(n_bins) per pixel and entropy_sliding O(radius); measured,
+# the box kernel is faster only while n_bins is below about 12 * radius
+_BOX_BINS_PER_RADIUS = 12
+
+def _uses_box(radius, n_bins, footprint):
+    """Whether _entropy_maps computes this footprint with entropy_box"""
+    return footprint == "square" and n_bins < _BOX_BINS_PER_RADIUS * radius
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _entropy_maps(image_bytes, radius, n_bins, max_side, footprint, channels):
+    """Local entropy of the selected channels at working resolution; returns a (len(channels), H, W) float32 array"""
+    img = _working_bins(image_bytes, n_bins, max_side)[list(channels)]
+    if GPU_AVAILABLE:
+        return entropy_gpu(img, radius, n_bins, footprint)
+    if _uses_box(radius, n_bins, footprint):
+        return entropy_box(img, radius, n_bins)
+    if footprint == "square":
+        return entropy_sliding(img, np.full(2 * radius + 1, radius, np.int64), n_bins)
+    return entropy_disk(img, radius, n_bins)
+
+# Measured per-pixel costs, in units of one window pixel counted by fill_entropy_at:
+# a fixed 6 per pending pixel on top of its window, 0.7 per sliding-kernel update,
+# and 3 per pixel plus 0.1 per bin update for entropy_box, whose loops vectorize
+_FILL_PIXEL_COST = 6
+_SLIDING_UPDATE_COST = 0.7
+_BOX_PIXEL_COST = 3
+_BOX_UPDATE_COST = 0.1
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _green_entropy(image_bytes, radius, n_bins, max_side, footprint):
+    """Green entropy map that is filled in lazily (NaN = not computed yet), with the lock guarding it.
+
+    radius and footprint are not used here; they only key the cache.
+    """
+    binned = _working_bins(image_bytes, n_bins, max_side)
+    return np.full(binned.shape[1:], np.nan, np.float32), threading.Lock()
+
+def _screened_green_entropy(image_bytes, radius, n_bins, max_side, footprint,
+                            entropy_red, entropy_blue, tolerance, want_entropy):
+    """Green entropy, computed only where the red and blue entropies match unless want_entropy is set.
+
+    Returns a read-only view of the shared map; pixels not computed yet are NaN.
+    """
+    entropy_green, lock = _green_entropy(image_bytes, radius, n_bins, max_side, footprint)
+    with lock:
+        pending = np.isnan(entropy_green)
+        if not want_entropy:
+            pending &= np.abs(entropy_red - entropy_blue) < tolerance
+        
+        # Counting each pending window costs its footprint size; a full map costs
+        # 2 * n_bins updates per pixel with the box kernel, 2 per row otherwise
+        offsets_y, offsets_x = _footprint_offsets(radius, footprint)
+        if _uses_box(radius, n_bins, footprint):
+            full_cost = _BOX_PIXEL_COST + 2 * n_bins * _BOX_UPDATE_COST
+        else:
+            full_cost = 2 * (2 * radius + 1) * _SLIDING_UPDATE_COST
+        n_pending = np.count_nonzero(pending)
+        fill_cost = n_pending * (offsets_y.size + _FILL_PIXEL_COST)
+        if GPU_AVAILABLE or fill_cost > full_cost * pending.size:
+            entropy_green[...] = _entropy_maps(image_bytes, radius, n_bins, max_side, footprint, (1,))[0]
+        elif n_pending:
+            green = _working_bins(image_bytes, n_bins, max_side)[1]
+            fill_entropy_at(green, radius, n_bins, offsets_y, offsets_x, pending, entropy_green)
     
-    # Calculate Local Entropy
-    selem = disk(radius)
+    # The map is shared by every session, so callers only get a read-only view
+    view = entropy_green.view()
+    view.setflags(write=False)
+    return view
+
+def process_image(image_bytes, radius=5, tolerance=0.1, n_bins=32, max_side=1600, footprint="disk", want_entropy=True):
+    """Process the uploaded image and return original and highlighted versions.
+
+    Returns (original, highlighted, mask, entropy_red, entropy_green, entropy_blue).
+    The entropy maps are at working resolution; without want_entropy, green is
+    NaN where it was not needed, and all three are None for grayscale images.
+    """
+    image_array, _ = _load_image(image_bytes)
     
-    entropy_red = filters.rank.entropy(red_channel, selem)
-    entropy_green = filters.rank.entropy(green_channel, selem)
-    entropy_blue = filters.rank.entropy(blue_channel, selem)
+    # Identical channels, as in grayscale images, match everywhere
+    if image_array.ndim == 2:
+        entropy_red = entropy_green = entropy_blue = None
+        if want_entropy:
+            # One map serves for all three identical channels
+            entropy_red = entropy_green = entropy_blue = _entropy_maps(image_bytes, radius, n_bins, max_side, footprint, (0,))[0]
+        
+        # Expand to RGB with read-only broadcast views instead of copies
+        shape = image_array.shape[:2] + (3,)
+        mask = np.ones(image_array.shape[:2], bool)
+        original = np.broadcast_to(image_array[:, :, None], shape)
+        highlighted_image = np.broadcast_to(RED, shape)
+        return original, highlighted_image, mask, entropy_red, entropy_green, entropy_blue
     
-    # Compare Entropy Across Channels
-    entropy_diff_rg = np.abs(entropy_red - entropy_green)
-    entropy_diff_rb = np.abs(entropy_red - entropy_blue)
-    entropy_diff_gb = np.abs(entropy_green - entropy_blue)
+    # The entropy maps are float32, so compare in float32 rather than promoting
+    tolerance = np.float32(tolerance)
+    entropy_red, entropy_blue = _entropy_maps(image_bytes, radius, n_bins, max_side, footprint, (0, 2))
+    entropy_green = _screened_green_entropy(image_bytes, radius, n_bins, max_side, footprint,
+                                            entropy_red, entropy_blue, tolerance, want_entropy)
     
     # Create a mask where entropy differences are within the tolerance
-    mask = (entropy_diff_rg < tolerance) & (entropy_diff_rb < tolerance) & (entropy_diff_gb < tolerance)
+    mask = compute_mask(entropy_red, entropy_green, entropy_blue, tolerance)
+    if mask.shape != image_array.shape[:2]:
+        # Scale the mask computed at working resolution back up to the full image
+        height, width = image_array.shape[:2]
+        mask = np.asarray(Image.fromarray(mask).resize((width, height), Image.NEAREST))
     
-    # Highlight Matching Pixels
+    # Highlight Matching Pixels in red, through flat indices while the mask is sparse
     highlighted_image = image_array.copy()
-    highlighted_image[mask] = [255, 0, 0]  # Mark matching pixels in red
+    if np.count_nonzero(mask) < _SPARSE_HIGHLIGHT_FRACTION * mask.size:
+        highlighted_image.reshape(-1, 3)[np.flatnonzero(mask)] = RED
+    else:
+        highlighted_image[mask] = RED
     
     return image_array, highlighted_image, mask, entropy_red, entropy_green, entropy_blue
 
@@ -60,8 +471,16 @@ def main():
     st.sidebar.header("Parameters")
     radius = st.sidebar.slider("Neighborhood Radius", 1, 10, 5, 
                               help="Size of the neighborhood for entropy calculation")
+    footprint = st.sidebar.radio("Neighborhood Shape", ["disk", "square"], horizontal=True,
+                                 help="Square neighborhoods are faster for large radii with few histogram bins")
     tolerance = st.sidebar.slider("Entropy Tolerance", 0.01, 1.0, 0.1, 
-                                 help="Maximum difference allowed between channel entropies")
+                                 help="Maximum difference allowed between channel entropies, in bits (entropy ranges from 0 to log2 of the bin count)")
+    n_bins = st.sidebar.select_slider("Histogram Bins", options=[8, 16, 32, 64, 128, 256], value=32,
+                                      help="Intensity levels per channel used for the entropy histogram. Fewer bins are faster but coarser")
+    max_side = st.sidebar.slider("Working Resolution", 256, 4096, 1600, step=64,
+                                 help="Longest image side used for the entropy calculation. Larger images are downscaled and the result is scaled back up")
+    show_heatmaps = st.sidebar.checkbox("Show Entropy Heatmaps",
+                                        help="Display the per-channel entropy maps below the results")
     
     # File uploader
     uploaded_file = st.file_uploader(
@@ -70,30 +489,31 @@ def main():
         help="Upload an image to analyze its entropy patterns"
     )
     
-    image = None
+    image_bytes = None
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
+        image_bytes = uploaded_file.getvalue()
     
-    if image is not None:
+    if image_bytes is not None:
         try:
-            # Verify image is properly loaded
-            if not hasattr(image, 'width') or not hasattr(image, 'height'):
-                st.error("Invalid image object. Please try loading the image again.")
-                return
+            # Decode once; the array is shared with process_image through the cache
+            image_array, mode = _load_image(image_bytes)
+            height, width = image_array.shape[:2]
             
             # Display original image info
             st.subheader("📊 Image Information")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Width", image.width)
+                st.metric("Width", width)
             with col2:
-                st.metric("Height", image.height)
+                st.metric("Height", height)
             with col3:
-                st.metric("Mode", image.mode)
+                st.metric("Mode", mode)
+            if max(height, width) > max_side:
+                st.caption(f"Entropy is computed at a working resolution of at most {max_side} px per side.")
             
             # Process the image
             with st.spinner("Processing image... This may take a moment."):
-                original, highlighted, mask, entropy_red, entropy_green, entropy_blue = process_image(image, radius, tolerance)
+                original, highlighted, mask, entropy_red, entropy_green, entropy_blue = process_image(image_bytes, radius, tolerance, n_bins, max_side, footprint, show_heatmaps)
             
             # Display results
             st.subheader("🖼️ Results")
@@ -112,7 +532,7 @@ def main():
             # Statistics
             st.subheader("📈 Analysis Statistics")
             total_pixels = mask.size
-            highlighted_pixels = np.sum(mask)
+            highlighted_pixels = int(np.count_nonzero(mask))
             percentage = (highlighted_pixels / total_pixels) * 100
             
             col1, col2, col3 = st.columns(3)
@@ -124,14 +544,14 @@ def main():
                 st.metric("Percentage Highlighted", f"{percentage:.2f}%")
             
             # Show entropy heatmaps using Streamlit's native image display
-            if st.checkbox("Show Entropy Heatmaps"):
+            if show_heatmaps:
                 st.subheader("🔥 Channel Entropy Heatmaps")
                 st.info("Entropy values are displayed as grayscale images (brighter = higher entropy)")
                 
                 # Normalize entropy values to 0-255 for display
-                entropy_red_norm = ((entropy_red - entropy_red.min()) / (entropy_red.max() - entropy_red.min()) * 255).astype(np.uint8)
-                entropy_green_norm = ((entropy_green - entropy_green.min()) / (entropy_green.max() - entropy_green.min()) * 255).astype(np.uint8)
-                entropy_blue_norm = ((entropy_blue - entropy_blue.min()) / (entropy_blue.max() - entropy_blue.min()) * 255).astype(np.uint8)
+                entropy_red_norm = normalize_to_uint8(entropy_red)
+                entropy_green_norm = normalize_to_uint8(entropy_green)
+                entropy_blue_norm = normalize_to_uint8(entropy_blue)
                 
                 col1, col2, col3 = st.columns(3)
                 
@@ -169,7 +589,10 @@ def main():
         
         **Parameters:**
         - **Neighborhood Radius**: Size of the area around each pixel used for entropy calculation
-        - **Entropy Tolerance**: How similar the entropy values need to be to be considered "matching"
+        - **Neighborhood Shape**: Whether that area is a disk or a square. Squares are faster when the radius is large and the bin count small
+        - **Entropy Tolerance**: How similar the entropy values need to be to be considered "matching", in bits. Entropy ranges from 0 to log2(bins), e.g. 5 bits for 32 bins
+        - **Working Resolution**: Larger images are downscaled to this size before calculating entropy, and the highlighted pixels are scaled back up
+        - **Histogram Bins**: Number of intensity levels each channel is quantized to before measuring entropy. 256 uses the full 8-bit range
         
         **Use Cases:**
         - Detecting uniform or textured regions